@@ -1,12 +1,24 @@
-import json
 import os
 import re
-from io import TextIOWrapper
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, List
 
 from ts import tsp
 
+try:
+    import orjson
+
+    def load_json(path: Path) -> Any:
+        return orjson.loads(path.read_bytes())
+
+except ImportError:
+    import json
+
+    def load_json(path: Path) -> Any:
+        with open(path, "r") as f:
+            return json.load(f)
+
 
 summary_dir = Path("tsp-summary/")
 field_names = ("Problem", "Iterations", "Tabu size", "Shuffle after", "Cost", "Path")
@@ -21,43 +33,50 @@ def to_map(*args: str) -> Dict[str, str]:
     return result
 
 
-def write_summary_rows(
-    *,
-    file: TextIOWrapper,
-    problem: str,
-) -> None:
+def parse(file: str) -> Dict[str, Any]:
+    match = pattern.fullmatch(file)
+    assert match is not None
+
+    problem, iterations, tabu_size, shuffle_after = match.groups()
+    data = load_json(summary_dir / file)
+
+    assert problem == data["problem"]
+    assert iterations == str(data["iterations"])
+    assert tabu_size == str(data["tabu-size"])
+    assert shuffle_after == str(data["shuffle-after"])
+
+    return data
+
+
+def summary_rows(problem: str) -> List[str]:
     tsp.TSPPathSolution.import_problem(problem)
-    file.write("Minimum\nAverage\nOptimal")
+    rows = ["Minimum", "Average", "Optimal"]
     try:
         solution = tsp.TSPPathSolution.read_optimal_solution()
-        file.write(f",,,,{solution.cost()}")
+        rows[-1] += f",,,,{solution.cost()}"
     except tsp.OptimalSolutionNotFound:
         pass
 
-    file.write("\n")
+    return rows
 
 
-with open(summary_dir / "tsp-summary.csv", "w") as csv:
-    csv.write(",".join(field_names) + "\n")
+if __name__ == "__main__":
+    files = [file for file in sorted(os.listdir(summary_dir)) if pattern.fullmatch(file)]
 
-    last_problem = None
-    for file in sorted(os.listdir(summary_dir)):
-        if match := pattern.fullmatch(file):
-            problem, iterations, tabu_size, shuffle_after = match.groups()
+    rows = [",".join(field_names)]
+    with ProcessPoolExecutor() as executor:
+        last_problem = None
+        for data in executor.map(parse, files, chunksize=max(1, len(files) // (4 * (os.cpu_count() or 1)))):
+            problem = data["problem"]
             if last_problem is not None and problem != last_problem:
-                write_summary_rows(file=csv, problem=last_problem)
+                rows.extend(summary_rows(last_problem))
 
-            with open(summary_dir / file, "r") as f:
-                data = json.load(f)
-
-            assert problem == data["problem"]
-            assert iterations == str(data["iterations"])
-            assert tabu_size == str(data["tabu-size"])
-            assert shuffle_after == str(data["shuffle-after"])
-
-            csv.write(",".join((problem, iterations, tabu_size, shuffle_after, str(data["cost"]), "\"" + str(data["path"]) + "\"")) + "\n")
+            rows.append(f"{problem},{data['iterations']},{data['tabu-size']},{data['shuffle-after']},{data['cost']},\"{data['path']}\"")
 
             last_problem = problem
 
-    if last_problem is not None:
-        write_summary_rows(file=csv, problem=last_problem)
+        if last_problem is not None:
+            rows.extend(summary_rows(last_problem))
+
+    with open(summary_dir / "tsp-summary.csv", "w") as csv:
+        csv.write("\n".join(rows) + "\n")
@@ -1,10 +1,20 @@
+import random
+import subprocess
+import sys
+from multiprocessing import Pool, get_context, shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
 from unittest.mock import MagicMock, patch
 
 import pytest
 
+import numpy as np
+
 from ts import tsp
 
 
+_T = TypeVar("_T")
+
+
 def test_unknown_problem() -> None:
     with pytest.raises(tsp.ProblemNotFound):
         tsp.TSPPathSolution.import_problem("hanoi69")
@@ -23,9 +33,304 @@ def test_unknown_optimal_solution() -> None:
         tsp.TSPPathSolution.read_optimal_solution()
 
 
+@pytest.mark.parametrize(
+    "problem, cost",
+    [("a280", 2579), ("berlin52", 7542), ("ch130", 6110), ("eil51", 426), ("kroA100", 21282), ("st70", 675), ("tsp225", 3916)],
+)
+def test_optimal_solution_cost(problem: str, cost: int) -> None:
+    # Published optimal tour lengths from TSPLIB
+    tsp.TSPPathSolution.import_problem(problem)
+    assert tsp.TSPPathSolution.read_optimal_solution().cost() == cost
+
+
 @patch("matplotlib.pyplot.show")
 def test_solution_plot(mock: MagicMock) -> None:
     tsp.TSPPathSolution.import_problem("a280")
     solution = tsp.TSPPathSolution.initial()
     solution.plot()
     mock.assert_called_once()
+
+
+def test_switch_problem() -> None:
+    with Pool(1) as pool:
+        for problem in ("a280", "berlin52", "a280"):
+            tsp.TSPPathSolution.import_problem(problem)
+            solution = tsp.TSPPathSolution.initial()
+            for neighborhood in solution.get_neighborhoods():
+                for _ in range(3):
+                    result = neighborhood.find_best_candidate(pool=pool, pool_size=1)
+                    assert result is not None
+                    assert max(result.after) < solution.dimension
+
+
+@pytest.mark.parametrize(
+    "neighborhood_type, kwargs, stale",
+    [
+        (tsp.Swap, {"first_length": 1, "second_length": 1}, (200, 200, 250, 250)),
+        (tsp.SegmentShift, {"segment_length": 1}, (200, 200, 250)),
+        (tsp.SegmentReverse, {"segment_length": 3}, (200, 202)),
+    ],
+)
+def test_stale_tabu_entries(neighborhood_type: Any, kwargs: Dict[str, int], stale: Tuple[int, ...]) -> None:
+    tsp.TSPPathSolution.import_problem("berlin52")
+    neighborhood_type.add_to_tabu(stale)
+    try:
+        with Pool(1) as pool:
+            assert neighborhood_type(tsp.TSPPathSolution.initial(), **kwargs).find_best_candidate(pool=pool, pool_size=1) is not None
+
+    finally:
+        neighborhood_type.clear_tabu()
+
+
+def test_reimport_cached_problem() -> None:
+    tsp.TSPPathSolution.import_problem("berlin52")
+    memory = tsp.TSPPathSolution.distances_memory
+    distances = tsp.TSPPathSolution.distances.copy()
+
+    tsp.TSPPathSolution.import_problem("a280")
+    tsp.TSPPathSolution.import_problem("berlin52")
+    assert tsp.TSPPathSolution.distances_memory is memory
+    assert tsp.TSPPathSolution.dimension == 52
+    assert (tsp.TSPPathSolution.distances == distances).all()
+
+
+def test_distances_cache_eviction() -> None:
+    cache_size = tsp.TSPPathSolution.distances_cache_size
+    tsp.TSPPathSolution.distances_cache_size = 0
+    try:
+        tsp.TSPPathSolution.import_problem("berlin52")
+        memory = tsp.TSPPathSolution.distances_memory
+        assert memory is not None
+
+        tsp.TSPPathSolution.import_problem("a280")
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=memory.name)
+
+        tsp.TSPPathSolution.import_problem("berlin52")
+        assert tsp.TSPPathSolution.distances_memory is not memory
+
+    finally:
+        tsp.TSPPathSolution.distances_cache_size = cache_size
+
+
+def test_distances_cache_shared_memory_limit(monkeypatch: pytest.MonkeyPatch) -> None:
+    def free_shared_memory() -> int:
+        # A 1 MiB /dev/shm holding the cached blocks and the current one
+        blocks = {id(cached[-1]): cached[-1].size for cached in tsp.TSPPathSolution._distances_cache.values()}
+        if tsp.TSPPathSolution.distances_memory is not None:
+            blocks[id(tsp.TSPPathSolution.distances_memory)] = tsp.TSPPathSolution.distances_memory.size
+
+        return (1 << 20) - sum(blocks.values())
+
+    monkeypatch.setattr(tsp.TSPPathSolution, "_free_shared_memory", staticmethod(free_shared_memory))
+    tsp.TSPPathSolution._evict_distances_cache(0)
+
+    tsp.TSPPathSolution.import_problem("a280")
+    memory = tsp.TSPPathSolution.distances_memory
+    assert memory is not None
+
+    for problem in ("berlin52", "ch150"):
+        tsp.TSPPathSolution.import_problem(problem)
+        assert tsp.TSPPathSolution._distances_cache_total() <= 1 << 19
+
+    # 442 x 442 int32 only fits after evicting the cached matrices
+    tsp.TSPPathSolution.import_problem("pcb442")
+    assert tsp.TSPPathSolution.distances_memory is not None
+    assert list(tsp.TSPPathSolution._distances_cache) == ["pcb442"]
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=memory.name)
+
+
+def test_cached_distances_unlinked_once() -> None:
+    script = """
+from ts import tsp
+for problem in ("berlin52", "a280", "berlin52", "a280"):
+    tsp.TSPPathSolution.import_problem(problem)
+"""
+    process = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    assert process.stderr == ""
+
+
+def _shuffled_solution(problem: str = "berlin52") -> tsp.TSPPathSolution:
+    tsp.TSPPathSolution.import_problem(problem)
+    random.seed(problem)
+    return tsp.TSPPathSolution.initial().shuffle(use_tqdm=False)
+
+
+@pytest.mark.parametrize("count", [1, 5, 51, 1000])
+def test_nearest_cities(count: int) -> None:
+    tsp.TSPPathSolution.import_problem("berlin52")
+    nearest = tsp.TSPPathSolution.nearest_cities(count)
+    assert nearest.shape == (52, min(count, 51))
+
+    for city, row in enumerate(nearest):
+        assert city not in row
+        distances = sorted(int(tsp.TSPPathSolution.distances[city, other]) for other in range(52) if other != city)
+        assert sorted(int(tsp.TSPPathSolution.distances[city, other]) for other in row) == distances[:nearest.shape[1]]
+
+
+def _check_move(solution: tsp.TSPPathSolution, result: tsp.TSPPathSolution) -> float:
+    # Compare with a solution whose cost and path are calculated from scratch
+    check = tsp.TSPPathSolution(after=result.after, before=result.before)
+    assert result.cost() == check.cost()
+    assert result.path == check.path
+    return result.cost() - solution.cost()
+
+
+def _check_scan(
+    scan: Callable[[np.ndarray, Tuple[_T, ...]], Tuple[Optional[float], Optional[_T]]],
+    candidates: Dict[_T, float],
+    dimension: int,
+) -> None:
+    """Compare a vectorized scan with the brute-force `candidates`, over blocks of positions like the process pool"""
+    tabu = random.sample(list(candidates), 5)
+    for _ in range(10):
+        results = [scan(indices, tuple(tabu)) for indices in np.array_split(np.arange(dimension), 3)]
+        min_delta, min_args = min(((d, a) for d, a in results if d is not None and a is not None), key=lambda r: r[0])
+        assert min_args not in tabu
+        assert candidates[min_args] == min_delta == min(delta for args, delta in candidates.items() if args not in tabu)
+        tabu.append(min_args)
+
+
+@pytest.mark.parametrize("nearest_neighbors", [None, 1, 5, 51])
+@pytest.mark.parametrize("scan_block_size", [7, 1 << 18])
+@pytest.mark.parametrize("first_length, second_length", [(1, 1), (2, 1), (1, 3), (3, 2)])
+def test_find_best_swap(
+    monkeypatch: pytest.MonkeyPatch,
+    scan_block_size: int,
+    first_length: int,
+    second_length: int,
+    nearest_neighbors: Optional[int],
+) -> None:
+    monkeypatch.setattr(tsp.Swap, "scan_block_size", scan_block_size)
+    solution = _shuffled_solution()
+    path = solution.path
+    n = solution.dimension
+    neighborhood = tsp.Swap(solution, first_length=first_length, second_length=second_length)
+    nearest = None if nearest_neighbors is None else solution.nearest_cities(nearest_neighbors)
+
+    candidates: Dict[Tuple[int, int, int, int], float] = {}
+    for first_head_index in range(n):
+        first_tail_index = first_head_index + first_length - 1
+        for offset in range(n - first_length - second_length + 1):
+            second_head_index = first_tail_index + offset + 1
+            if nearest is not None and path[second_head_index % n] not in nearest[path[first_head_index - 1]]:
+                continue
+
+            swap = (
+                path[first_head_index],
+                path[first_tail_index % n],
+                path[second_head_index % n],
+                path[(second_head_index + second_length - 1) % n],
+            )
+            candidates[swap] = _check_move(solution, neighborhood.swap(*swap))
+            assert candidates[swap] == neighborhood.swap_delta(*swap)
+
+    _check_scan(lambda indices, tabu: neighborhood.find_best_swap(indices, tabu, nearest_neighbors), candidates, n)
+
+
+@pytest.mark.parametrize("nearest_neighbors", [None, 1, 5, 51])
+@pytest.mark.parametrize("scan_block_size", [7, 1 << 18])
+@pytest.mark.parametrize("segment_length", [1, 2, 3, 5])
+def test_find_best_insertion(
+    monkeypatch: pytest.MonkeyPatch,
+    scan_block_size: int,
+    segment_length: int,
+    nearest_neighbors: Optional[int],
+) -> None:
+    monkeypatch.setattr(tsp.SegmentShift, "scan_block_size", scan_block_size)
+    solution = _shuffled_solution()
+    path = solution.path
+    n = solution.dimension
+    neighborhood = tsp.SegmentShift(solution, segment_length=segment_length)
+    nearest = None if nearest_neighbors is None else solution.nearest_cities(nearest_neighbors)
+
+    candidates: Dict[Tuple[int, int, int], float] = {}
+    for segment_first_index in range(n):
+        segment_last_index = segment_first_index + segment_length - 1
+        for offset in range(n - segment_length - 1):
+            if offset == n - 2 * segment_length - 1 and offset > segment_length - 1:
+                continue  # Yields the same tour as offset `segment_length - 1` of another segment
+
+            if nearest is not None and path[(segment_last_index + offset + 1) % n] not in nearest[path[segment_first_index]]:
+                continue
+
+            insertion = (path[segment_first_index], path[segment_last_index % n], path[(segment_last_index + offset + 1) % n])
+            candidates[insertion] = _check_move(solution, neighborhood.insert_after(*insertion))
+            assert candidates[insertion] == neighborhood.insert_after_delta(*insertion)
+
+    _check_scan(lambda indices, tabu: neighborhood.find_best_insertion(indices, tabu, nearest_neighbors), candidates, n)
+
+
+@pytest.mark.parametrize("segment_length", [3, 4, 6])
+def test_segment_reverse(segment_length: int) -> None:
+    solution = _shuffled_solution()
+    path = solution.path
+    n = solution.dimension
+    neighborhood = tsp.SegmentReverse(solution, segment_length=segment_length)
+
+    candidates: Dict[Tuple[int, int], float] = {}
+    for index in range(n):
+        segment = [path[(index + offset) % n] for offset in range(segment_length)]
+        candidates[(segment[0], segment[-1])] = _check_move(solution, neighborhood.reverse(segment))
+
+    try:
+        with Pool(1) as pool:
+            for _ in range(10):
+                tabu = set(neighborhood.tabu_set)
+                result = neighborhood.find_best_candidate(pool=pool, pool_size=1)
+                assert result is not None
+                assert _check_move(solution, result) == min(delta for args, delta in candidates.items() if args not in tabu)
+
+    finally:
+        tsp.SegmentReverse.clear_tabu()
+
+
+def test_tabu_search_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(tsp.Swap, "pool_threshold", 0)
+    monkeypatch.setattr(tsp.SegmentShift, "pool_threshold", 0)
+    tsp.TSPPathSolution.import_problem("berlin52")
+    initial = tsp.TSPPathSolution.initial()
+
+    solution = tsp.TSPPathSolution.tabu_search(pool_size=2, iterations_count=20, use_tqdm=False, shuffle_after=10)
+    check = tsp.TSPPathSolution(after=solution.after, before=solution.before)
+    assert solution.cost() == check.cost()
+    assert solution.cost() <= initial.cost()
+
+
+def _check_spawned_pool_scan(solution: tsp.TSPPathSolution) -> None:
+    with get_context("spawn").Pool(2) as pool:
+        for neighborhood in solution.get_neighborhoods():
+            neighborhood_type = type(neighborhood)
+            try:
+                pooled = neighborhood.find_best_candidate(pool=pool, pool_size=2)
+                neighborhood_type.clear_tabu()
+                expected = neighborhood.find_best_candidate(pool=pool, pool_size=1)
+                assert pooled is not None and expected is not None
+                assert pooled.cost() == expected.cost()
+
+            finally:
+                neighborhood_type.clear_tabu()
+
+
+def test_spawned_pool_scan(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Spawned workers do not inherit the imported problem, they attach to the shared distance matrix by name
+    monkeypatch.setattr(tsp.Swap, "pool_threshold", 0)
+    monkeypatch.setattr(tsp.SegmentShift, "pool_threshold", 0)
+    _check_spawned_pool_scan(_shuffled_solution())
+
+
+def test_private_distances(monkeypatch: pytest.MonkeyPatch) -> None:
+    # /dev/shm has no room for the distance matrix: it is kept in private memory and copied to worker processes
+    monkeypatch.setattr(tsp.TSPPathSolution, "_free_shared_memory", staticmethod(lambda: 0))
+    monkeypatch.setattr(tsp.Swap, "pool_threshold", 0)
+    monkeypatch.setattr(tsp.SegmentShift, "pool_threshold", 0)
+    solution = _shuffled_solution("kroC100")
+    assert tsp.TSPPathSolution.distances_memory is None
+    assert tsp.TSPPathSolution.read_optimal_solution().cost() == 20749
+
+    _check_spawned_pool_scan(solution)
+
+    monkeypatch.undo()
+    tsp.TSPPathSolution.import_problem("berlin52")
+    assert tsp.TSPPathSolution.distances_memory is not None
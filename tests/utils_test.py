@@ -1,3 +1,4 @@
+import random
 from math import sqrt
 
 from ts import utils
@@ -92,3 +93,46 @@ def test_igd_2() -> None:
     )
     assert igd is not None
     assert utils.isclose(igd, 0.0)
+
+
+def test_pareto_front() -> None:
+    front = utils.build_pareto_front(
+        [
+            (100, 500),
+            (200, 400),
+            (250, 450),
+            (300, 300),
+            (300, 350),
+            (500, 100),
+            (500, 500),
+        ]
+    )
+    assert front == {(100, 500), (200, 400), (300, 300), (500, 100)}
+
+
+def test_pareto_front_near_duplicates() -> None:
+    # Objectives within isclose tolerance are ties, as in cost_dominate
+    front = utils.build_pareto_front([(1, 0), (1, 3e-05), (0.99998, 1), (2, 0.00002), (3, -1)])
+    assert front == {(1, 0), (1, 3e-05), (3, -1)}
+
+
+def test_pareto_front_random() -> None:
+    for _ in range(200):
+        costs = [(random.randint(0, 5) + random.uniform(-2e-05, 2e-05), random.randint(0, 5) + random.uniform(-2e-05, 2e-05)) for _ in range(30)]
+        assert utils.build_pareto_front(costs) == {c for c in costs if not any(utils.cost_dominate(d, c) for d in costs)}
+
+
+def test_pareto_front_3d() -> None:
+    front = utils.build_pareto_front(
+        [
+            (1, 5, 5),
+            (5, 1, 5),
+            (5, 5, 1),
+            (2, 6, 6),
+            (5, 5, 5),
+            (1, 5, 5.00001),
+            (3, 3, 3),
+            (3, 3, 4),
+        ]
+    )
+    assert front == {(1, 5, 5), (5, 1, 5), (5, 5, 1), (1, 5, 5.00001), (3, 3, 3)}
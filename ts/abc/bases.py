@@ -150,3 +150,10 @@ class BaseNeighborhood(Generic[_ST, _TT]):
         with cls._tabu_lock:
             cls._maxlen = maxlen
             cls.__remove_from_tabu()
+
+    @final
+    @classmethod
+    def clear_tabu(cls) -> None:
+        with cls._tabu_lock:
+            cls._tabu_list.clear()
+            cls.tabu_set.clear()
@@ -151,11 +151,13 @@ class MultiObjectiveSolution(BaseSolution, BaseMulticostComparison):
                 propagate: List[Self] = []
 
                 def process_solution(solution: Self) -> bool:
-                    neighborhoods = list(solution.get_neighborhoods())
-                    random.shuffle(neighborhoods)
+                    neighborhoods = solution.get_neighborhoods()
+                    order = list(range(len(neighborhoods)))
+                    random.shuffle(order)
 
                     improved = False
-                    for neighborhood in neighborhoods:
+                    for index in order:
+                        neighborhood = neighborhoods[index]
                         propagated = False
 
                         for candidate in neighborhood.find_best_candidates(pool=pool, pool_size=pool_size):
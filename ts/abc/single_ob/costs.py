@@ -1,13 +1,11 @@
 from __future__ import annotations
 
-from functools import total_ordering
 from typing import Any, final
 
 
 __all__ = ("BaseCostComparison",)
 
 
-@total_ordering
 class BaseCostComparison:
     """Base class for objects holding a real-valued number as their costs"""
 
@@ -27,9 +25,37 @@ class BaseCostComparison:
 
         return NotImplemented
 
+    @final
+    def __ne__(self, other: Any) -> bool:
+        if isinstance(other, self.__class__):
+            return self.cost() != other.cost()
+
+        return NotImplemented
+
     @final
     def __lt__(self, other: Any) -> bool:
         if isinstance(other, self.__class__):
             return self.cost() < other.cost()
 
         return NotImplemented
+
+    @final
+    def __le__(self, other: Any) -> bool:
+        if isinstance(other, self.__class__):
+            return self.cost() <= other.cost()
+
+        return NotImplemented
+
+    @final
+    def __gt__(self, other: Any) -> bool:
+        if isinstance(other, self.__class__):
+            return self.cost() > other.cost()
+
+        return NotImplemented
+
+    @final
+    def __ge__(self, other: Any) -> bool:
+        if isinstance(other, self.__class__):
+            return self.cost() >= other.cost()
+
+        return NotImplemented
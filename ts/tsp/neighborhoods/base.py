@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import TypeVar, TYPE_CHECKING
+from typing import Any, ClassVar, List, Optional, TypeVar, TYPE_CHECKING
+
+import numpy as np
 
 from ...abc import SingleObjectiveNeighborhood
 if TYPE_CHECKING:
@@ -18,12 +20,53 @@ else:
 class TSPBaseNeighborhood(SingleObjectiveNeighborhood[_TSPPathSolution, _T]):
 
     __slots__ = ()
+    # The maximum number of candidates to evaluate at once in a vectorized neighborhood scan
+    scan_block_size: ClassVar[int] = 1 << 18
+    # The number of tasks to create per process when distributing a scan to the process pool
+    tasks_per_process: ClassVar[int] = 4
+    # Scans with fewer candidates than this run in the current process: below it, sending the tasks to the process
+    # pool costs more than the scan itself
+    pool_threshold: ClassVar[int] = 1 << 15
+    # If specified, neighborhoods supporting candidate lists only evaluate moves that connect a city to one of its
+    # `nearest_neighbors` nearest cities. The default is to evaluate every move.
+    nearest_neighbors: ClassVar[Optional[int]] = None
 
     def __init__(self, solution: TSPPathSolution, /) -> None:
         super().__init__(solution)
         self.extras["problem"] = solution.problem_name
-        self.extras["distances"] = solution.distances
+        if solution.distances_memory is None:
+            # The distance matrix did not fit in shared memory, worker processes receive a copy of it
+            self.extras["precalculated_distances"] = solution.distances
+
+        else:
+            # Only the name of the shared memory block is sent to worker processes, not the distance matrix itself
+            self.extras["shared_distances"] = solution.distances_memory.name
+
+    @staticmethod
+    def excluded_delta(dtype: np.dtype) -> Any:
+        """The value assigned to cost deltas of excluded (e.g. tabu) candidates in a vectorized scan"""
+        if np.issubdtype(dtype, np.integer):
+            return np.iinfo(dtype).max
+
+        return np.inf
+
+    def use_pool(self, candidates: int, pool_size: int) -> bool:
+        """Whether a scan of `candidates` candidates should be distributed to the process pool"""
+        return pool_size > 1 and candidates >= self.pool_threshold
+
+    def split_positions(self, pool_size: int) -> List[np.ndarray]:
+        """Split the path positions into contiguous blocks to be scanned by the process pool
+
+        There are more blocks than processes so that a slow process does not hold up the others.
+        """
+        dimension = self._solution.dimension
+        positions = np.arange(dimension, dtype=np.int32)  # Half the pickled size of the default int64
+        return np.array_split(positions, max(1, min(dimension, self.tasks_per_process * pool_size)))
 
     def ensure_imported_data(self) -> None:
-        if self.cls.problem_name is None:
-            self.cls.import_problem(self.extras["problem"], precalculated_distances=self.extras["distances"])
+        if self.cls.problem_name != self.extras["problem"]:
+            self.cls.import_problem(
+                self.extras["problem"],
+                precalculated_distances=self.extras.get("precalculated_distances"),
+                shared_distances=self.extras.get("shared_distances"),
+            )
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-import itertools
 from multiprocessing import pool
 from typing import List, Optional, Tuple, TYPE_CHECKING
 
+import numpy as np
+
 from .base import TSPBaseNeighborhood
-from ...bundle import IPCBundle
 if TYPE_CHECKING:
     from ..solutions import TSPPathSolution
 
@@ -27,8 +27,22 @@ class SegmentReverse(TSPBaseNeighborhood[Tuple[int, int]]):
         if segment_length < 3:
             raise ValueError("Segment length must be 3 or more")
 
+    def reverse_delta(self, segment_first: int, segment_last: int) -> float:
+        """Calculate the cost difference of a segment reversal without constructing the new solution"""
+        solution = self._solution
+        distances = solution.distances
+
+        before_segment = solution.before[segment_first]
+        after_segment = solution.after[segment_last]
+
+        return float(
+            distances[before_segment, segment_last] + distances[segment_first, after_segment]
+            - distances[before_segment, segment_first] - distances[segment_last, after_segment]
+        )
+
     def reverse(self, segment: List[int]) -> TSPPathSolution:
         solution = self._solution
+        cost = solution.cost() + self.reverse_delta(segment[0], segment[-1])
 
         before = list(solution.before)
         after = list(solution.after)
@@ -36,63 +50,54 @@ class SegmentReverse(TSPBaseNeighborhood[Tuple[int, int]]):
         before_segment = before[segment[0]]
         after_segment = after[segment[-1]]
 
-        cost = (
-            solution.cost()
-            + solution.distances[before_segment][segment[-1]] + solution.distances[segment[0]][after_segment]
-            - solution.distances[before_segment][segment[0]] - solution.distances[segment[-1]][after_segment]
-        )
-
         for index in segment:
             before[index], after[index] = after[index], before[index]
 
         before[segment[-1]], after[before_segment] = before_segment, segment[-1]
         before[after_segment], after[segment[0]] = segment[0], after_segment
 
-        return self.cls(after=tuple(after), before=tuple(before), cost=cost)
+        # Derive the new path by reversing a slice of the current one, so that the next neighborhood scan does
+        # not have to walk the linked list again
+        path = solution.path_array
+        path = np.roll(path, -int(np.flatnonzero(path == segment[0])[0]))
+        path[:len(segment)] = path[len(segment) - 1::-1]
+        path = np.roll(path, -int(np.flatnonzero(path == 0)[0]))
+
+        return self.cls(after=tuple(after), before=tuple(before), cost=cost, path_array=path)
 
     def find_best_candidate(self, *, pool: pool.Pool, pool_size: int) -> Optional[TSPPathSolution]:
+        # There are only `dimension` candidates, evaluating them at once with NumPy is much cheaper than
+        # distributing them to the process pool.
         solution = self._solution
+        distances = solution.distances
+        path = solution.path_array
+        n = solution.dimension
+
+        segment_first_index = np.arange(n)
+        segment_first = path
+        segment_last = path[(segment_first_index + self._segment_length - 1) % n]
+        before_segment = path[(segment_first_index - 1) % n]
+        after_segment = path[(segment_first_index + self._segment_length) % n]
+
+        delta = (
+            distances[before_segment, segment_last] + distances[segment_first, after_segment]
+            - distances[before_segment, segment_first] - distances[segment_last, after_segment]
+        )
 
-        bundles: List[IPCBundle[SegmentReverse, List[List[int]]]] = [IPCBundle(self, []) for _ in range(pool_size)]
-        bundle_iter = itertools.cycle(bundles)
-
-        for start in range(solution.dimension):
-            segment = []
-            for d in range(self._segment_length):
-                segment.append(solution.path[(start + d) % solution.dimension])
-
-            next(bundle_iter).data.append(segment)
-
-        result: Optional[TSPPathSolution] = None
-        min_pair: Optional[Tuple[int, int]] = None
-        for result_temp, min_pair_temp in pool.imap_unordered(self.static_find_best_candidate, bundles):
-            if result_temp is None or min_pair_temp is None:
-                continue
-
-            if min_pair_temp in self.tabu_set:
-                continue
-
-            if result is None or result_temp < result:
-                result = result_temp
-                min_pair = min_pair_temp
-
-        if min_pair is not None:
-            self.add_to_tabu(min_pair)
+        # Locate tabu reversals by the position of their first city instead of comparing every candidate against them
+        positions = np.empty(n, dtype=np.intp)
+        positions[path] = np.arange(n)
 
-        return result
+        tabu_array = np.array(tuple(self.tabu_set), dtype=np.intp).reshape(-1, 2)
+        tabu_array = tabu_array[(tabu_array < n).all(axis=1)]  # Entries left over from a previously imported problem
+        tabu_index = positions[tabu_array[:, 0]]
 
-    @staticmethod
-    def static_find_best_candidate(bundle: IPCBundle[SegmentReverse, List[List[int]]]) -> Tuple[Optional[TSPPathSolution], Optional[Tuple[int, int]]]:
-        neighborhood = bundle.neighborhood
-        neighborhood.ensure_imported_data()
+        excluded = self.excluded_delta(delta.dtype)
+        delta[tabu_index[segment_last[tabu_index] == tabu_array[:, 1]]] = excluded
 
-        result: Optional[TSPPathSolution] = None
-        min_pair: Optional[Tuple[int, int]] = None
-        for segment in bundle.data:
-            pair = (segment[0], segment[-1])
-            shifted = neighborhood.reverse(segment)
-            if result is None or shifted < result:
-                result = shifted
-                min_pair = pair
+        index = int(np.argmin(delta))
+        if delta[index] == excluded:
+            return None
 
-        return result, min_pair
+        self.add_to_tabu((int(segment_first[index]), int(segment_last[index])))
+        return self.reverse([int(path[(index + d) % n]) for d in range(self._segment_length)])
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-import itertools
 from multiprocessing import pool
 from typing import List, Optional, Tuple, TYPE_CHECKING
 
+import numpy as np
+
 from .base import TSPBaseNeighborhood
 from ...bundle import IPCBundle
 if TYPE_CHECKING:
@@ -27,8 +28,25 @@ class SegmentShift(TSPBaseNeighborhood[Tuple[int, int, int]]):
         if segment_length > solution.dimension + 2:
             raise ValueError(f"Segment length {segment_length} is too low.")
 
+    def insert_after_delta(self, segment_first: int, segment_last: int, x: int) -> float:
+        """Calculate the cost difference of a segment insertion without constructing the new solution"""
+        solution = self._solution
+        distances = solution.distances
+
+        before_segment = solution.before[segment_first]
+        after_segment = solution.after[segment_last]
+        after_x = solution.after[x]
+
+        return float(
+            distances[before_segment, after_segment]
+            + distances[x, segment_first] + distances[segment_last, after_x]
+            - distances[before_segment, segment_first] - distances[segment_last, after_segment]
+            - distances[x, after_x]
+        )
+
     def insert_after(self, segment_first: int, segment_last: int, x: int) -> TSPPathSolution:
         solution = self._solution
+        cost = solution.cost() + self.insert_after_delta(segment_first, segment_last, x)
 
         before = list(solution.before)
         after = list(solution.after)
@@ -37,61 +55,159 @@ class SegmentShift(TSPBaseNeighborhood[Tuple[int, int, int]]):
         after_segment = after[segment_last]
         after_x = after[x]
 
-        cost = (
-            solution.cost()
-            + solution.distances[before_segment][after_segment]
-            + solution.distances[x][segment_first] + solution.distances[segment_last][after_x]
-            - solution.distances[before_segment][segment_first] - solution.distances[segment_last][after_segment]
-            - solution.distances[x][after_x]
-        )
-
         after[before_segment], before[after_segment] = after_segment, before_segment
         after[x], before[segment_first] = segment_first, x
         after[segment_last], before[after_x] = after_x, segment_last
 
-        return self.cls(after=tuple(after), before=tuple(before), cost=cost)
+        # Derive the new path by moving a slice of the current one, so that the next neighborhood scan does
+        # not have to walk the linked list again
+        path = solution.path_array
+        path = np.roll(path, -int(np.flatnonzero(path == segment_first)[0]))
+        x_index = int(np.flatnonzero(path == x)[0])
+        path = np.concatenate((path[self._segment_length:x_index + 1], path[:self._segment_length], path[x_index + 1:]))
+        path = np.roll(path, -int(np.flatnonzero(path == 0)[0]))
+
+        return self.cls(after=tuple(after), before=tuple(before), cost=cost, path_array=path)
 
     def find_best_candidate(self, *, pool: pool.Pool, pool_size: int) -> Optional[TSPPathSolution]:
         solution = self._solution
+        solution.path_array  # Calculate the path before sending the solution to other processes
 
-        bundles: List[IPCBundle[SegmentShift, List[Tuple[int, int, int]]]] = [IPCBundle(self, []) for _ in range(pool_size)]
-        bundle_iter = itertools.cycle(bundles)
-
-        for segment_first_index in range(solution.dimension):
-            segment_end_index = (segment_first_index + self._segment_length - 1) % solution.dimension
-            for d in range(solution.dimension - self._segment_length - 1):
-                index = (segment_end_index + d + 1) % solution.dimension
-                next(bundle_iter).data.append((solution.path[segment_first_index], solution.path[segment_end_index], solution.path[index]))
+        tabu = tuple(self.tabu_set)
+        nearest_neighbors = self.nearest_neighbors
+        min_delta: Optional[float] = None
+        min_args: Optional[Tuple[int, int, int]] = None
+        if not self.use_pool(solution.dimension * (nearest_neighbors or solution.dimension), pool_size):
+            min_delta, min_args = self.find_best_insertion(np.arange(solution.dimension), tabu, nearest_neighbors)
+
+        else:
+            bundles: List[IPCBundle[SegmentShift, Tuple[np.ndarray, Tuple[Tuple[int, int, int], ...], Optional[int]]]] = [
+                IPCBundle(self, (indices, tabu, nearest_neighbors))
+                for indices in self.split_positions(pool_size)
+            ]
+
+            for min_delta_temp, min_args_temp in pool.imap_unordered(self.static_find_best_candidate, bundles):
+                if min_delta_temp is None or min_args_temp is None:
+                    continue
+
+                if min_delta is None or min_delta_temp < min_delta:
+                    min_delta = min_delta_temp
+                    min_args = min_args_temp
+
+        if min_args is None:
+            return None
+
+        self.add_to_tabu(min_args)
+        return self.insert_after(*min_args)
+
+    def find_best_insertion(
+        self,
+        segment_first_indices: np.ndarray,
+        tabu: Tuple[Tuple[int, int, int], ...],
+        nearest_neighbors: Optional[int] = None,
+    ) -> Tuple[Optional[float], Optional[Tuple[int, int, int]]]:
+        """Find the best non-tabu insertion of a segment starting at one of the given positions in the path
+
+        All candidates are evaluated at once with NumPy. Rows of the delta matrix correspond to the position of
+        the segment, columns to the distance from the segment to the insertion point.
+
+        If `nearest_neighbors` is specified, only insertions after one of the nearest cities to the first city
+        of the segment are evaluated, and columns correspond to these cities instead.
+        """
+        solution = self._solution
+        distances = solution.distances
+        path = solution.path_array
+        n = solution.dimension
+
+        offsets = np.arange(n - self._segment_length - 1)
+        if n - 2 * self._segment_length - 1 > self._segment_length - 1:
+            # Inserting the segment after the next `segment_length` cities (offset `segment_length - 1`) yields the
+            # same tour as inserting those cities before the segment, which is also enumerated from the segment
+            # at offset `n - 2 * segment_length - 1`. Only keep the former.
+            offsets = np.delete(offsets, n - 2 * self._segment_length - 1)
+
+        # Offsets that are not candidates (the insertion point is inside the segment, right before it or
+        # the duplicate above) are mapped to -1
+        column_of_offset = np.full(n, -1, dtype=np.intp)
+        column_of_offset[offsets] = np.arange(offsets.size)
+
+        if nearest_neighbors is None:
+            nearest = None
+            columns = offsets.size
+        else:
+            nearest = solution.nearest_cities(nearest_neighbors)
+            columns = nearest.shape[1]
+
+        rows = max(1, self.scan_block_size // max(1, columns))
+
+        positions = np.empty(n, dtype=np.intp)
+        positions[path] = np.arange(n)
+
+        # Locate tabu insertions by their segment position and offset
+        tabu_array = np.array(tabu, dtype=np.intp).reshape(-1, 3)
+        tabu_array = tabu_array[(tabu_array < n).all(axis=1)]  # Entries left over from a previously imported problem
+        tabu_segment_first_index = positions[tabu_array[:, 0]]
+        tabu_offset = (positions[tabu_array[:, 2]] - tabu_segment_first_index - self._segment_length) % n
+        tabu_valid = (
+            (column_of_offset[tabu_offset] >= 0)
+            & (path[(tabu_segment_first_index + self._segment_length - 1) % n] == tabu_array[:, 1])
+        )
+        tabu_segment_first_index = tabu_segment_first_index[tabu_valid]
+        tabu_offset = tabu_offset[tabu_valid]
 
-        result: Optional[TSPPathSolution] = None
-        min_pair: Optional[Tuple[int, int, int]] = None
-        for result_temp, min_pair_temp in pool.imap_unordered(self.static_find_best_candidate, bundles):
-            if result_temp is None or min_pair_temp is None:
-                continue
+        row_of_position = np.full(n, -1, dtype=np.intp)
 
-            if min_pair_temp in self.tabu_set:
+        min_delta: Optional[float] = None
+        min_args: Optional[Tuple[int, int, int]] = None
+        for block in range(0, segment_first_indices.size, rows):
+            segment_first_index = segment_first_indices[block:block + rows, np.newaxis]
+            row_of_position[segment_first_index[:, 0]] = np.arange(segment_first_index.shape[0])
+
+            segment_first = path[segment_first_index]
+            segment_last = path[(segment_first_index + self._segment_length - 1) % n]
+            before_segment = path[(segment_first_index - 1) % n]
+            after_segment = path[(segment_first_index + self._segment_length) % n]
+
+            if nearest is None:
+                offset = np.broadcast_to(offsets, (segment_first_index.shape[0], columns))
+            else:
+                offset = (positions[nearest[segment_first[:, 0]]] - segment_first_index - self._segment_length) % n
+
+            x_index = segment_first_index + self._segment_length + offset
+            x = path[x_index % n]
+            after_x = path[(x_index + 1) % n]
+
+            delta = (
+                distances[before_segment, after_segment]
+                + distances[x, segment_first] + distances[segment_last, after_x]
+                - distances[before_segment, segment_first] - distances[segment_last, after_segment]
+                - distances[x, after_x]
+            )
+
+            excluded = self.excluded_delta(delta.dtype)
+            if nearest is not None:
+                delta[column_of_offset[offset] < 0] = excluded
+
+            tabu_row = row_of_position[tabu_segment_first_index]
+            tabu_in_block = tabu_row >= 0
+            tabu_index, tabu_column = np.nonzero(offset[tabu_row[tabu_in_block]] == tabu_offset[tabu_in_block, np.newaxis])
+            delta[tabu_row[tabu_in_block][tabu_index], tabu_column] = excluded
+            row_of_position[segment_first_index[:, 0]] = -1
+
+            if delta.size == 0:
                 continue
 
-            if result is None or result_temp < result:
-                result = result_temp
-                min_pair = min_pair_temp
+            row, column = np.unravel_index(np.argmin(delta), delta.shape)
+            if delta[row, column] != excluded and (min_delta is None or delta[row, column] < min_delta):
+                min_delta = float(delta[row, column])
+                min_args = (int(segment_first[row, 0]), int(segment_last[row, 0]), int(x[row, column]))
 
-        if min_pair is not None:
-            self.add_to_tabu(min_pair)
-
-        return result
+        return min_delta, min_args
 
     @staticmethod
-    def static_find_best_candidate(bundle: IPCBundle[SegmentShift, List[Tuple[int, int, int]]]) -> Tuple[Optional[TSPPathSolution], Optional[Tuple[int, int, int]]]:
+    def static_find_best_candidate(
+        bundle: IPCBundle[SegmentShift, Tuple[np.ndarray, Tuple[Tuple[int, int, int], ...], Optional[int]]],
+    ) -> Tuple[Optional[float], Optional[Tuple[int, int, int]]]:
         neighborhood = bundle.neighborhood
         neighborhood.ensure_imported_data()
-
-        result: Optional[TSPPathSolution] = None
-        min_args: Optional[Tuple[int, int, int]] = None
-        for args in bundle.data:
-            shifted = neighborhood.insert_after(*args)
-            if result is None or shifted < result:
-                result = shifted
-                min_args = args
-
-        return result, min_args
+        return neighborhood.find_best_insertion(*bundle.data)
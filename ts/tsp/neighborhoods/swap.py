@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-import itertools
 from multiprocessing import pool
 from typing import List, Optional, Tuple, TYPE_CHECKING
 
+import numpy as np
+
 from .base import TSPBaseNeighborhood
 from ...bundle import IPCBundle
 if TYPE_CHECKING:
@@ -28,8 +29,44 @@ class Swap(TSPBaseNeighborhood[Tuple[int, int, int, int]]):
         self._first_length = first_length
         self._second_length = second_length
 
+    def swap_delta(self, first_head: int, first_tail: int, second_head: int, second_tail: int) -> float:
+        """Calculate the cost difference of a swap operation without constructing the new solution"""
+        solution = self._solution
+        before = solution.before
+        after = solution.after
+        distances = solution.distances
+
+        if first_head == after[second_tail]:
+            first_head, first_tail, second_head, second_tail = second_head, second_tail, first_head, first_tail
+
+        if first_tail == before[second_head]:
+            before_first = before[first_head]
+            after_second = after[second_tail]
+
+            return float(
+                distances[before_first, second_head]
+                + distances[second_tail, first_head]
+                + distances[first_tail, after_second]
+                - distances[before_first, first_head]
+                - distances[first_tail, second_head]
+                - distances[second_tail, after_second]
+            )
+
+        before_first = before[first_head]
+        before_second = before[second_head]
+        after_first = after[first_tail]
+        after_second = after[second_tail]
+
+        return float(
+            distances[before_first, second_head] + distances[second_tail, after_first]
+            + distances[before_second, first_head] + distances[first_tail, after_second]
+            - distances[before_first, first_head] - distances[first_tail, after_first]
+            - distances[before_second, second_head] - distances[second_tail, after_second]
+        )
+
     def swap(self, first_head: int, first_tail: int, second_head: int, second_tail: int) -> TSPPathSolution:
         solution = self._solution
+        cost = solution.cost() + self.swap_delta(first_head, first_tail, second_head, second_tail)
 
         before = list(solution.before)
         after = list(solution.after)
@@ -41,16 +78,6 @@ class Swap(TSPBaseNeighborhood[Tuple[int, int, int, int]]):
             before_first = before[first_head]
             after_second = after[second_tail]
 
-            cost = (
-                solution.cost()
-                + solution.distances[before_first][second_head]
-                + solution.distances[second_tail][first_head]
-                + solution.distances[first_tail][after_second]
-                - solution.distances[before_first][first_head]
-                - solution.distances[first_tail][second_head]
-                - solution.distances[second_tail][after_second]
-            )
-
             after[before_first], before[second_head] = second_head, before_first
             after[second_tail], before[first_head] = first_head, second_tail
             after[first_tail], before[after_second] = after_second, first_tail
@@ -61,72 +88,215 @@ class Swap(TSPBaseNeighborhood[Tuple[int, int, int, int]]):
             after_first = after[first_tail]
             after_second = after[second_tail]
 
-            cost = (
-                solution.cost()
-                + solution.distances[before_first][second_head] + solution.distances[second_tail][after_first]
-                + solution.distances[before_second][first_head] + solution.distances[first_tail][after_second]
-                - solution.distances[before_first][first_head] - solution.distances[first_tail][after_first]
-                - solution.distances[before_second][second_head] - solution.distances[second_tail][after_second]
-            )
-
             after[before_first], before[second_head] = second_head, before_first
             after[before_second], before[first_head] = first_head, before_second
             after[second_tail], before[after_first] = after_first, second_tail
             after[first_tail], before[after_second] = after_second, first_tail
 
-        return self.cls(after=tuple(after), before=tuple(before), cost=cost)
+        # Derive the new path by exchanging 2 slices of the current one, so that the next neighborhood scan does
+        # not have to walk the linked list again
+        path = solution.path_array
+        path = np.roll(path, -int(np.flatnonzero(path == first_head)[0]))
+        first_end = int(np.flatnonzero(path == first_tail)[0]) + 1
+        second_start = int(np.flatnonzero(path == second_head)[0])
+        second_end = int(np.flatnonzero(path == second_tail)[0]) + 1
+        path = np.concatenate((path[second_start:second_end], path[first_end:second_start], path[:first_end], path[second_end:]))
+        path = np.roll(path, -int(np.flatnonzero(path == 0)[0]))
+
+        return self.cls(after=tuple(after), before=tuple(before), cost=cost, path_array=path)
 
     def find_best_candidate(self, *, pool: pool.Pool, pool_size: int) -> Optional[TSPPathSolution]:
         solution = self._solution
+        solution.path_array  # Calculate the path before sending the solution to other processes
 
-        bundles: List[IPCBundle[Swap, List[Tuple[int, int, int, int]]]] = [IPCBundle(self, []) for _ in range(pool_size)]
-        bundle_iter = itertools.cycle(bundles)
+        tabu = tuple(self.tabu_set)
+        nearest_neighbors = self.nearest_neighbors
+        min_delta: Optional[float] = None
+        min_swap: Optional[Tuple[int, int, int, int]] = None
+        if not self.use_pool(solution.dimension * (nearest_neighbors or solution.dimension), pool_size):
+            min_delta, min_swap = self.find_best_swap(np.arange(solution.dimension), tabu, nearest_neighbors)
 
-        for first_head_index in range(solution.dimension):
-            first_tail_index = (first_head_index + self._first_length - 1) % solution.dimension
+        else:
+            bundles: List[IPCBundle[Swap, Tuple[np.ndarray, Tuple[Tuple[int, int, int, int], ...], Optional[int]]]] = [
+                IPCBundle(self, (indices, tabu, nearest_neighbors))
+                for indices in self.split_positions(pool_size)
+            ]
 
-            for d in range(solution.dimension - self._first_length - self._second_length + 1):
-                second_head_index = (first_tail_index + d + 1) % solution.dimension
-                second_tail_index = (second_head_index + self._second_length - 1) % solution.dimension
+            for min_delta_temp, min_swap_temp in pool.imap_unordered(self.static_find_best_candidate, bundles):
+                if min_delta_temp is None or min_swap_temp is None:
+                    continue
 
-                # Guaranteed order: first_head - first_tail - second_head - second_tail
-                arg = (
-                    solution.path[first_head_index],
-                    solution.path[first_tail_index],
-                    solution.path[second_head_index],
-                    solution.path[second_tail_index],
-                )
-                next(bundle_iter).data.append(arg)
+                if min_delta is None or min_delta_temp < min_delta:
+                    min_delta = min_delta_temp
+                    min_swap = min_swap_temp
+
+        if min_swap is None:
+            return None
+
+        self.add_to_tabu(min_swap)
+        return self.swap(*min_swap)
+
+    @staticmethod
+    def adjacent_swap_delta(
+        distances: np.ndarray,
+        before_first: np.ndarray,
+        first_head: np.ndarray,
+        first_tail: np.ndarray,
+        second_head: np.ndarray,
+        second_tail: np.ndarray,
+        after_second: np.ndarray,
+    ) -> np.ndarray:
+        """Calculate the cost differences of swaps in which the second segment follows the first one immediately"""
+        return (
+            distances[before_first, second_head]
+            + distances[second_tail, first_head]
+            + distances[first_tail, after_second]
+            - distances[before_first, first_head]
+            - distances[first_tail, second_head]
+            - distances[second_tail, after_second]
+        )
+
+    def find_best_swap(
+        self,
+        first_head_indices: np.ndarray,
+        tabu: Tuple[Tuple[int, int, int, int], ...],
+        nearest_neighbors: Optional[int] = None,
+    ) -> Tuple[Optional[float], Optional[Tuple[int, int, int, int]]]:
+        """Find the best non-tabu swap whose first segment starts at one of the given positions in the path
 
-        result: Optional[TSPPathSolution] = None
+        All candidates are evaluated at once with NumPy. Rows of the delta matrix correspond to the position of
+        the first segment, columns to the gap between the two segments.
+
+        If `nearest_neighbors` is specified, only swaps that connect the city before the first segment to one
+        of its nearest cities are evaluated, and columns correspond to these cities instead.
+        """
+        solution = self._solution
+        distances = solution.distances
+        path = solution.path_array
+        n = solution.dimension
+
+        # Gaps between the 2 segments range from 0 (adjacent) to max_offset (adjacent, wrapping around the path)
+        max_offset = n - self._first_length - self._second_length
+        if nearest_neighbors is None:
+            nearest = None
+            columns = max_offset + 1
+        else:
+            nearest = solution.nearest_cities(nearest_neighbors)
+            columns = nearest.shape[1]
+
+        rows = max(1, self.scan_block_size // max(1, columns))
+
+        positions = np.empty(n, dtype=np.intp)
+        positions[path] = np.arange(n)
+
+        # Locate tabu swaps by their first segment position and gap
+        tabu_array = np.array(tabu, dtype=np.intp).reshape(-1, 4)
+        tabu_array = tabu_array[(tabu_array < n).all(axis=1)]  # Entries left over from a previously imported problem
+        tabu_first_head_index = positions[tabu_array[:, 0]]
+        tabu_offset = (positions[tabu_array[:, 2]] - tabu_first_head_index - self._first_length) % n
+        tabu_valid = (
+            (tabu_offset <= max_offset)
+            & (path[(tabu_first_head_index + self._first_length - 1) % n] == tabu_array[:, 1])
+            & (path[(positions[tabu_array[:, 2]] + self._second_length - 1) % n] == tabu_array[:, 3])
+        )
+        tabu_first_head_index = tabu_first_head_index[tabu_valid]
+        tabu_offset = tabu_offset[tabu_valid]
+
+        row_of_position = np.full(n, -1, dtype=np.intp)
+
+        min_delta: Optional[float] = None
         min_swap: Optional[Tuple[int, int, int, int]] = None
-        for result_temp, min_swap_temp in pool.imap_unordered(self.static_find_best_candidate, bundles):
-            if result_temp is None or min_swap_temp is None:
-                continue
+        for block in range(0, first_head_indices.size, rows):
+            # Guaranteed order: first_head - first_tail - second_head - second_tail
+            first_head_index = first_head_indices[block:block + rows, np.newaxis]
+            row_of_position[first_head_index[:, 0]] = np.arange(first_head_index.shape[0])
 
-            if min_swap_temp in self.tabu_set:
-                continue
+            first_head = path[first_head_index]
+            first_tail = path[(first_head_index + self._first_length - 1) % n]
+            before_first = path[(first_head_index - 1) % n]
+            after_first = path[(first_head_index + self._first_length) % n]
 
-            if result is None or result_temp < result:
-                result = result_temp
-                min_swap = min_swap_temp
+            if nearest is None:
+                offset = np.broadcast_to(np.arange(columns), (first_head_index.shape[0], columns))
+            else:
+                offset = (positions[nearest[before_first[:, 0]]] - first_head_index - self._first_length) % n
 
-        if min_swap is not None:
-            self.add_to_tabu(min_swap)
+            second_head_index = first_head_index + self._first_length + offset
 
-        return result
+            second_head = path[second_head_index % n]
+            second_tail = path[(second_head_index + self._second_length - 1) % n]
+            before_second = path[(second_head_index - 1) % n]
+            after_second = path[(second_head_index + self._second_length) % n]
+
+            delta = (
+                distances[before_first, second_head] + distances[second_tail, after_first]
+                + distances[before_second, first_head] + distances[first_tail, after_second]
+                - distances[before_first, first_head] - distances[first_tail, after_first]
+                - distances[before_second, second_head] - distances[second_tail, after_second]
+            )
+
+            if nearest is None:
+                # The second segment follows the first one immediately
+                delta[:, 0] = self.adjacent_swap_delta(
+                    distances,
+                    before_first[:, 0], first_head[:, 0], first_tail[:, 0],
+                    second_head[:, 0], second_tail[:, 0], after_second[:, 0],
+                )
+
+                # The first segment follows the second one immediately (wrapping around the path)
+                delta[:, -1] = self.adjacent_swap_delta(
+                    distances,
+                    before_second[:, -1], second_head[:, -1], second_tail[:, -1],
+                    first_head[:, 0], first_tail[:, 0], after_first[:, 0],
+                )
+
+            else:
+                shape = delta.shape
+                adjacent = offset == 0
+                delta[adjacent] = self.adjacent_swap_delta(
+                    distances,
+                    np.broadcast_to(before_first, shape)[adjacent],
+                    np.broadcast_to(first_head, shape)[adjacent],
+                    np.broadcast_to(first_tail, shape)[adjacent],
+                    second_head[adjacent], second_tail[adjacent], after_second[adjacent],
+                )
+
+                adjacent = offset == max_offset
+                delta[adjacent] = self.adjacent_swap_delta(
+                    distances,
+                    before_second[adjacent], second_head[adjacent], second_tail[adjacent],
+                    np.broadcast_to(first_head, shape)[adjacent],
+                    np.broadcast_to(first_tail, shape)[adjacent],
+                    np.broadcast_to(after_first, shape)[adjacent],
+                )
+
+            excluded = self.excluded_delta(delta.dtype)
+            if nearest is not None:
+                # The second segment overlaps the first one
+                delta[offset > max_offset] = excluded
+
+            tabu_row = row_of_position[tabu_first_head_index]
+            tabu_in_block = tabu_row >= 0
+            tabu_index, tabu_column = np.nonzero(offset[tabu_row[tabu_in_block]] == tabu_offset[tabu_in_block, np.newaxis])
+            delta[tabu_row[tabu_in_block][tabu_index], tabu_column] = excluded
+            row_of_position[first_head_index[:, 0]] = -1
+
+            row, column = np.unravel_index(np.argmin(delta), delta.shape)
+            if delta[row, column] != excluded and (min_delta is None or delta[row, column] < min_delta):
+                min_delta = float(delta[row, column])
+                min_swap = (
+                    int(first_head[row, 0]),
+                    int(first_tail[row, 0]),
+                    int(second_head[row, column]),
+                    int(second_tail[row, column]),
+                )
+
+        return min_delta, min_swap
 
     @staticmethod
-    def static_find_best_candidate(bundle: IPCBundle[Swap, List[Tuple[int, int, int, int]]]) -> Tuple[Optional[TSPPathSolution], Optional[Tuple[int, int, int, int]]]:
+    def static_find_best_candidate(
+        bundle: IPCBundle[Swap, Tuple[np.ndarray, Tuple[Tuple[int, int, int, int], ...], Optional[int]]],
+    ) -> Tuple[Optional[float], Optional[Tuple[int, int, int, int]]]:
         neighborhood = bundle.neighborhood
         neighborhood.ensure_imported_data()
-
-        result: Optional[TSPPathSolution] = None
-        min_swap: Optional[Tuple[int, int, int, int]] = None
-        for swap in bundle.data:
-            swapped = neighborhood.swap(*swap)
-            if result is None or swapped < result:
-                result = swapped
-                min_swap = swap
-
-        return result, min_swap
+        return neighborhood.find_best_swap(*bundle.data)
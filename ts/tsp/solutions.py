@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-import itertools
+import atexit
+import os
 import random
-import re
-from math import sqrt
-from multiprocessing import pool as p
+from multiprocessing import pool as p, shared_memory
 from os import path
-from typing import Any, ClassVar, Final, List, Optional, Tuple, Union, TYPE_CHECKING
+from typing import Any, ClassVar, Dict, Final, List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
 
+import numpy as np
 from matplotlib import axes, pyplot
 from tqdm import tqdm
 
@@ -27,47 +27,68 @@ class TSPPathSolution(SingleObjectiveSolution):
     __slots__ = (
         "_cost",
         "_path",
+        "_path_array",
         "after",
         "before",
     )
     problem_name: ClassVar[Optional[str]] = None
+    distances_memory: ClassVar[Optional[shared_memory.SharedMemory]] = None
+    distances_memory_owner: ClassVar[Optional[int]] = None
+    _nearest_cities: ClassVar[Dict[int, np.ndarray]] = {}
+    # Previously imported problems keep their distance matrices in shared memory (up to this many bytes in total,
+    # and at most half of the free space of /dev/shm), so that importing them again does not parse the file and
+    # calculate the matrix again
+    distances_cache_size: ClassVar[int] = 1 << 28
+    _distances_cache: ClassVar[Dict[str, Tuple[int, str, Tuple[float, ...], Tuple[float, ...], shared_memory.SharedMemory]]] = {}
+    _distances_cache_owner: ClassVar[Optional[int]] = None
     if TYPE_CHECKING:
         _cost: float
         _path: Optional[Tuple[int, ...]]
+        _path_array: Optional[np.ndarray]
         after: Final[Tuple[int, ...]]
         before: Final[Tuple[int, ...]]
 
         dimension: ClassVar[int]
         edge_weight_type: ClassVar[str]
-        distances: ClassVar[Tuple[Tuple[float, ...], ...]]
+        # C-contiguous int32 matrix: TSPLIB defines EUC_2D distances as nint() of the Euclidean distance, so no
+        # precision is lost compared to float64 at half the memory traffic. Tour costs are summed in int64.
+        distances: ClassVar[np.ndarray]
 
         x: Tuple[float, ...]
         y: Tuple[float, ...]
 
-    def __init__(self, *, after: Tuple[int, ...], before: Tuple[int, ...], cost: Optional[float] = None) -> None:
+    def __init__(
+        self,
+        *,
+        after: Tuple[int, ...],
+        before: Tuple[int, ...],
+        cost: Optional[float] = None,
+        path_array: Optional[np.ndarray] = None,
+    ) -> None:
         self.after = after
         self.before = before
 
         if cost is None:
-            result = 0.0
-            last, current = 0, self.after[0]
-            while current != 0:
-                result += self.distances[last][current]
-                last, current = current, self.after[current]
-
-            result += self.distances[last][current]
-            self._cost = result
+            # Each city contributes the edge to its successor, so the tour length is a single gather
+            self._cost = float(self.distances[np.arange(self.dimension), np.array(after, dtype=np.int32)].sum(dtype=np.int64))
 
         else:
             self._cost = cost
 
         self._path = None
+        self._path_array = path_array
+        if path_array is not None:
+            path_array.flags.writeable = False
 
     @property
     def path(self) -> Tuple[int, ...]:
         if self._path is not None:
             return self._path
 
+        if self._path_array is not None:
+            self._path = tuple(self._path_array.tolist())
+            return self._path
+
         path = [0]
         current = self.after[0]
         while current != 0:
@@ -77,9 +98,37 @@ class TSPPathSolution(SingleObjectiveSolution):
         self._path = tuple(path)
         return self._path
 
+    @property
+    def path_array(self) -> np.ndarray:
+        """The path of this solution as a read-only NumPy array, for vectorized neighborhood scans"""
+        if self._path_array is not None:
+            return self._path_array
+
+        self._path_array = np.array(self.path, dtype=np.int32)
+        self._path_array.flags.writeable = False
+        return self._path_array
+
     def cost(self) -> float:
         return self._cost
 
+    def __getstate__(self) -> Tuple[Tuple[int, ...], float, Optional[np.ndarray]]:
+        # Solutions are sent to worker processes with every neighborhood task: `before` and the path tuple can
+        # be rebuilt from `after` and the path array, so they are not pickled.
+        return self.after, self._cost, self._path_array
+
+    def __setstate__(self, state: Tuple[Tuple[int, ...], float, Optional[np.ndarray]]) -> None:
+        after, self._cost, self._path_array = state
+
+        before = np.empty(len(after), dtype=np.int32)
+        if self._path_array is None:
+            before[np.array(after, dtype=np.int32)] = np.arange(len(after), dtype=np.int32)
+        else:
+            before[self._path_array] = np.roll(self._path_array, 1)
+
+        self.after = after  # type: ignore
+        self.before = tuple(before.tolist())  # type: ignore
+        self._path = None
+
     def post_optimization(self, *, pool: p.Pool, pool_size: int, use_tqdm: bool) -> TSPPathSolution:
         result = self
         iterations: Union[Tuple[SingleObjectiveNeighborhood[TSPPathSolution, Any], ...], tqdm[SingleObjectiveNeighborhood[TSPPathSolution, Any]]] = self.get_neighborhoods()
@@ -109,37 +158,41 @@ class TSPPathSolution(SingleObjectiveSolution):
         )
 
     def shuffle(self, *, use_tqdm: bool = True) -> TSPPathSolution:
-        def adjacent_distance(index: int) -> float:
-            return self.distances[index][self.after[index]] + self.distances[index][self.before[index]]
-
-        indices = sorted(range(self.dimension), key=adjacent_distance, reverse=True)[:self.dimension // 2]
+        # Cities with the longest adjacent edges first (stable, like sorted(..., reverse=True))
+        cities = np.arange(self.dimension)
+        adjacent_distance = self.distances[cities, self.after] + self.distances[cities, self.before]
+        indices: List[int] = np.argsort(-adjacent_distance, kind="stable")[:self.dimension // 2].tolist()
         iterations: Union[List[int], tqdm[int]] = indices
         if use_tqdm:
             iterations = tqdm(iterations, desc="Shuffle", ascii=" █", colour="red")
 
-        result = self
+        # Swapping 2 cities only exchanges their positions in the path, so apply all swaps to the path first and
+        # construct a single solution at the end
+        path: List[int] = self.path_array.tolist()
+        positions = [0] * self.dimension
+        for position, city in enumerate(path):
+            positions[city] = position
+
         for index in iterations:
             other = random.choice(indices)
             if other == index:
                 other = (other + 1) % self.dimension
 
-            result = Swap(result, first_length=1, second_length=1).swap(index, index, other, other)
+            index_position, other_position = positions[index], positions[other]
+            path[index_position], path[other_position] = other, index
+            positions[index], positions[other] = other_position, index_position
 
-        return result
+        return self.from_path(path)
 
     def plot(self) -> None:
         _, ax = pyplot.subplots()
         assert isinstance(ax, axes.Axes)
 
-        quiver_kwargs = {
-            "color": "darkblue",
-            "angles": "xy",
-            "scale_units": "xy",
-            "scale": 1,
-        }
-        for index in range(self.dimension):
-            next = self.after[index]
-            ax.quiver(self.x[index], self.y[index], self.x[next] - self.x[index], self.y[next] - self.y[index], **quiver_kwargs)
+        # Draw all arrows with a single artist instead of one quiver per city
+        x = np.array(self.x)
+        y = np.array(self.y)
+        after = np.array(self.after)
+        ax.quiver(x, y, x[after] - x, y[after] - y, color="darkblue", angles="xy", scale_units="xy", scale=1)
 
         ax.scatter(self.x, self.y, c="blue", label="City")
         for index in range(self.dimension):
@@ -153,22 +206,38 @@ class TSPPathSolution(SingleObjectiveSolution):
 
     @classmethod
     def initial(cls) -> TSPPathSolution:
-        after = [-1] * cls.dimension
-        before = [-1] * cls.dimension
+        # Greedy nearest neighbor construction, visited cities are masked out with the largest distance
+        unreachable = np.iinfo(cls.distances.dtype).max
+        visited = np.zeros(cls.dimension, dtype=np.bool_)
+        visited[0] = True
 
-        path = [0]
-        cities = set(range(1, cls.dimension))
-        while len(cities) > 0:
-            current = path[-1]
-            insert = min(cities, key=cls.distances[current].__getitem__)
-            path.append(insert)
-            cities.remove(insert)
+        path = np.zeros(cls.dimension, dtype=np.int32)
+        for index in range(1, cls.dimension):
+            distances = np.where(visited, unreachable, cls.distances[path[index - 1]])
+            path[index] = insert = distances.argmin()
+            visited[insert] = True
 
-        for index in range(cls.dimension):
-            after[path[index]] = path[(index + 1) % cls.dimension]
-            before[path[index]] = path[(index - 1 + cls.dimension) % cls.dimension]
+        after = np.empty(cls.dimension, dtype=np.int32)
+        before = np.empty(cls.dimension, dtype=np.int32)
+        after[path] = np.roll(path, -1)
+        before[path] = np.roll(path, 1)
 
-        return cls(after=tuple(after), before=tuple(before))
+        return cls(after=tuple(after.tolist()), before=tuple(before.tolist()), path_array=path)
+
+    @classmethod
+    def nearest_cities(cls, count: int) -> np.ndarray:
+        """Returns an array whose i-th row contains the indices of the `count` nearest cities to city i, in no
+        particular order. Results are cached until another problem is imported.
+        """
+        count = max(1, min(count, cls.dimension - 1))
+        try:
+            return cls._nearest_cities[count]
+        except KeyError:
+            distances = cls.distances.astype(np.int64)
+            np.fill_diagonal(distances, np.iinfo(np.int64).max)
+
+            result = cls._nearest_cities[count] = np.argpartition(distances, count - 1, axis=1)[:, :count]
+            return result
 
     @classmethod
     def read_optimal_solution(cls) -> TSPPathSolution:
@@ -204,46 +273,227 @@ class TSPPathSolution(SingleObjectiveSolution):
         return cls(after=tuple(after), before=tuple(before))
 
     @classmethod
-    def import_problem(cls, problem: str, *, precalculated_distances: Optional[Tuple[Tuple[float, ...], ...]] = None) -> None:
+    def import_problem(
+        cls,
+        problem: str,
+        *,
+        precalculated_distances: Optional[Union[np.ndarray, Sequence[Sequence[float]]]] = None,
+        shared_distances: Optional[str] = None,
+    ) -> None:
+        """Import a TSP problem
+
+        The distance matrix is placed in shared memory so that worker processes can attach to it by name
+        (see `shared_distances`) instead of receiving a copy with every task. If it does not fit in the free
+        space of /dev/shm, it is kept in private memory and `distances_memory` is None. Importing a problem
+        again reuses its cached distance matrix, see `distances_cache_size`.
+
+        Parameters
+        -----
+        problem:
+            The problem name
+        precalculated_distances:
+            The precalculated distance matrix of this problem
+        shared_distances:
+            The name of the shared memory block holding the distance matrix of this problem, created by
+            another process
+        """
         problem = problem.removesuffix(".tsp")
+        if problem == cls.problem_name:
+            return
+
         archive_file = path.join("problems", "tsp", f"{problem}.tsp", f"{problem}.tsp")
         if not path.isfile(archive_file):
             raise ProblemNotFound(problem)
 
+        # Tabu entries of the previous problem refer to its cities, which may not exist in this one
+        for neighborhood in (Swap, SegmentShift, SegmentReverse):
+            neighborhood.clear_tabu()
+
+        cacheable = precalculated_distances is None and shared_distances is None
+        if cls._distances_cache_owner != os.getpid():
+            # The cache was inherited from the parent process, which owns its shared memory blocks
+            cls._distances_cache = {}
+            cls._distances_cache_owner = os.getpid()
+
+        cached = cls._distances_cache.pop(problem, None) if cacheable else None
+        if cached is not None:
+            cls.problem_name = problem
+            cls.dimension, cls.edge_weight_type, cls.x, cls.y, cached_memory = cached
+            cls.distances = np.ndarray((cls.dimension, cls.dimension), dtype=np.int32, buffer=cached_memory.buf)
+            cls._nearest_cities.clear()
+            cls._replace_distances_memory(cached_memory, owned=True)
+            cls._cache_distances_memory(problem, cached_memory)
+            return
+
         cls.problem_name = problem
         try:
             with open(archive_file, "r") as file:
-                data = file.read()
+                # Read the specification part line by line, the coordinates are then parsed by NumPy directly from
+                # the file instead of reading the whole file into memory first
+                specification: Dict[str, str] = {}
+                for line in iter(file.readline, ""):
+                    if line.startswith("NODE_COORD_SECTION"):
+                        break
 
-            cls.dimension = int(re.search(r"DIMENSION\s*:\s*(\d+)", data).group(1))  # type: ignore
-            cls.edge_weight_type = re.search(r"EDGE_WEIGHT_TYPE\s*:\s*(\w+)", data).group(1)  # type: ignore
+                    key, _, value = line.partition(":")
+                    specification[key.strip()] = value.strip()
 
-            if cls.edge_weight_type == "EUC_2D":
-                x = []
-                y = []
-                for match in re.finditer(r"^\s*\d+\s+([\d\.\-+e]+\s+[\d\.\-+e]+)\s*?$", data, flags=re.MULTILINE):
-                    _x, _y = map(float, match.group(1).split())
-                    x.append(_x)
-                    y.append(_y)
+                cls.dimension = int(specification["DIMENSION"])
+                cls.edge_weight_type = specification["EDGE_WEIGHT_TYPE"]
 
-                cls.x = tuple(x)
-                cls.y = tuple(y)
+                if cls.edge_weight_type != "EUC_2D":
+                    raise UnsupportedEdgeWeightType(cls.edge_weight_type)
 
-                if precalculated_distances is None:
-                    distances = [[0.0] * cls.dimension for _ in range(cls.dimension)]
-                    for i, j in itertools.combinations(range(cls.dimension), 2):
-                        distances[i][j] = distances[j][i] = int(sqrt((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2))
+                coordinates = np.loadtxt(file, usecols=(1, 2), ndmin=2, max_rows=cls.dimension)
 
-                    cls.distances = tuple(tuple(row) for row in distances)
+            cls.x = tuple(coordinates[:, 0].tolist())
+            cls.y = tuple(coordinates[:, 1].tolist())
 
-                else:
-                    cls.distances = precalculated_distances
+            shape = (cls.dimension, cls.dimension)
+            memory: Optional[shared_memory.SharedMemory]
+            if shared_distances is not None:
+                memory = shared_memory.SharedMemory(name=shared_distances)
+                distances: np.ndarray = np.ndarray(shape, dtype=np.int32, buffer=memory.buf)
 
             else:
-                raise UnsupportedEdgeWeightType(cls.edge_weight_type)
+                # TSPLIB rounds EUC_2D distances to the nearest integer, so int32 stores them exactly in half the
+                # space of float64. The matrix is written directly into shared memory, without an intermediate copy.
+                size = max(1, cls.dimension * cls.dimension * np.dtype(np.int32).itemsize)
+                free = cls._free_shared_memory()
+                if free is not None and size > free:
+                    # Make room by evicting cached matrices of other problems
+                    cls._evict_distances_cache(cls._distances_cache_total() - (size - free))
+                    free = cls._free_shared_memory()
+
+                if free is None or size <= free:
+                    memory = shared_memory.SharedMemory(create=True, size=size)
+
+                else:
+                    # Writing past the free space of /dev/shm kills the process with SIGBUS instead of raising an
+                    # exception, so the matrix is built in private memory and sent to worker processes with each task
+                    memory = None
+
+                try:
+                    if memory is None:
+                        distances = np.empty(shape, dtype=np.int32)
+
+                    else:
+                        distances = np.ndarray(shape, dtype=np.int32, buffer=memory.buf)
+
+                    if precalculated_distances is None:
+                        cls._calculate_distances(coordinates, out=distances)
+
+                    else:
+                        distances[:] = precalculated_distances
+
+                except BaseException:
+                    if memory is not None:
+                        memory.unlink()
+
+                    raise
+
+                if memory is not None:
+                    # Registered once per block: a cached block may be reinstalled many times
+                    atexit.register(memory.unlink)
+
+            cls.distances = distances
+            cls._nearest_cities.clear()
+            cls._replace_distances_memory(memory, owned=shared_distances is None)
+            if cacheable and memory is not None:
+                cls._cache_distances_memory(problem, memory)
 
         except Exception as exc:
+            cls.problem_name = None
             raise ProblemParsingException(problem, exc) from exc
 
+    @staticmethod
+    def _calculate_distances(coordinates: np.ndarray, *, out: np.ndarray) -> None:
+        """Calculate the EUC_2D distance matrix of the given coordinates into `out`
+
+        Rows are processed in small blocks so that the float64 temporaries stay in cache instead of spanning
+        the whole matrix.
+        """
+        x = coordinates[:, 0]
+        y = coordinates[:, 1]
+        rows = max(1, (1 << 16) // max(1, x.size))
+        for start in range(0, x.size, rows):
+            # Operate in place to keep only 2 temporary blocks alive
+            euclidean = x[start:start + rows, np.newaxis] - x
+            euclidean *= euclidean
+            dy = y[start:start + rows, np.newaxis] - y
+            dy *= dy
+            euclidean += dy
+
+            np.sqrt(euclidean, out=euclidean)
+            euclidean += 0.5
+            out[start:start + rows] = euclidean  # nint() from the TSPLIB specification, the assignment truncates
+
+    @staticmethod
+    def _free_shared_memory() -> Optional[int]:
+        """The free space in bytes of the tmpfs backing POSIX shared memory, or None if it cannot be determined
+
+        Docker limits /dev/shm to 64 MiB by default, which only holds the distance matrix of about 4000 cities.
+        """
+        try:
+            stat = os.statvfs("/dev/shm")
+        except (AttributeError, OSError):  # os.statvfs is not available on Windows
+            return None
+
+        return stat.f_bavail * stat.f_frsize
+
+    @classmethod
+    def _replace_distances_memory(cls, memory: Optional[shared_memory.SharedMemory], *, owned: bool) -> None:
+        previous = cls.distances_memory
+        if (
+            previous is not None
+            and previous is not memory
+            and cls.distances_memory_owner == os.getpid()
+            and all(cached[-1] is not previous for cached in cls._distances_cache.values())
+        ):
+            atexit.unregister(previous.unlink)
+            previous.unlink()
+
+        cls.distances_memory = memory
+        cls.distances_memory_owner = None
+        if memory is not None and owned:
+            cls.distances_memory_owner = os.getpid()
+
+    @classmethod
+    def _cache_distances_memory(cls, problem: str, memory: shared_memory.SharedMemory) -> None:
+        cls._distances_cache[problem] = (cls.dimension, cls.edge_weight_type, cls.x, cls.y, memory)
+
+        # The cache may use at most half of the shared memory space left to it, so that it does not fill /dev/shm
+        limit = cls.distances_cache_size
+        free = cls._free_shared_memory()
+        if free is not None:
+            limit = min(limit, (cls._distances_cache_total() + free) // 2)
+
+        cls._evict_distances_cache(limit)
+
+    @classmethod
+    def _distances_cache_total(cls) -> int:
+        return sum(cached[-1].size for cached in cls._distances_cache.values())
+
+    @classmethod
+    def _evict_distances_cache(cls, limit: int) -> None:
+        """Evict the least recently imported problems, except the current one, until the cache holds at most
+        `limit` bytes
+        """
+        total = cls._distances_cache_total()
+        for name in list(cls._distances_cache):
+            if total <= limit:
+                break
+
+            evicted = cls._distances_cache[name][-1]
+            if evicted is not cls.distances_memory:
+                del cls._distances_cache[name]
+                total -= evicted.size
+                atexit.unregister(evicted.unlink)
+                evicted.unlink()
+                try:
+                    evicted.close()  # Release the mapping now, so that /dev/shm space is freed
+                except BufferError:
+                    pass  # A NumPy view of this matrix is still alive, the mapping is released with it
+
     def __hash__(self) -> int:
         return hash(self.after)
@@ -5,7 +5,7 @@ import os
 import platform
 import threading
 import sys
-from typing import Any, Callable, Iterable, List, Optional, ParamSpec, Sequence, Set, Tuple, TypeVar, TYPE_CHECKING, overload
+from typing import Any, Callable, Iterable, Optional, ParamSpec, Sequence, Set, Tuple, TypeVar, TYPE_CHECKING, overload
 
 import numpy as np
 from matplotlib import axes, pyplot
@@ -111,24 +111,17 @@ def isclose(first: Any, second: Any, /) -> bool:
         return abs(first - second) < 0.0001
 
 
-def normalize_costs(costs: Sequence[Tuple[float, float]], /) -> List[Tuple[float, float]]:
-    min_costs = (min(cost[0] for cost in costs), min(cost[1] for cost in costs))
-    max_costs = (max(cost[0] for cost in costs), max(cost[1] for cost in costs))
+def normalize_costs(costs: np.ndarray, /) -> np.ndarray:
+    min_costs = costs.min(axis=0)
+    ranges = costs.max(axis=0) - min_costs
 
-    def scale(cost: Tuple[float, float], /) -> Tuple[float, float]:
-        try:
-            x = (cost[0] - min_costs[0]) / (max_costs[0] - min_costs[0])
-        except ZeroDivisionError:  # 0 / 0
-            x = 1
-
-        try:
-            y = (cost[1] - min_costs[1]) / (max_costs[1] - min_costs[1])
-        except ZeroDivisionError:  # 0 / 0
-            y = 1
+    result = np.ones_like(costs)  # 0 / 0
+    np.divide(costs - min_costs, ranges, out=result, where=ranges != 0)
+    return result
 
-        return (x, y)
 
-    return list(map(scale, costs))
+def unique_costs(costs: Iterable[Tuple[float, float]], /) -> np.ndarray:
+    return np.unique(np.array(list(costs), dtype=np.float64).reshape(-1, 2), axis=0)
 
 
 def hypervolume(
@@ -136,12 +129,11 @@ def hypervolume(
     *,
     ref_point: Tuple[float, float],
 ) -> Optional[float]:
-    pareto_costs = list(set(pareto_costs))
-    pareto_costs.append(ref_point)
-    *normalized, ref_normalized_point = normalize_costs(pareto_costs)
+    costs = np.vstack((unique_costs(pareto_costs), ref_point))
+    normalized = normalize_costs(costs)
 
-    indicator = HV(ref_point=ref_normalized_point)
-    result = indicator(np.array(normalized))
+    indicator = HV(ref_point=normalized[-1])
+    result = indicator(normalized[:-1])
     if result is None:
         message = f"Cannot calculate HV in hypervolume({pareto_costs!r}, ref_point={ref_point!r})"
         raise ValueError(message)
@@ -154,18 +146,14 @@ def inverted_generational_distance(
     *,
     ref_costs: Sequence[Tuple[float, float]],
 ) -> Optional[float]:
-    pareto_costs = list(set(pareto_costs))
-    ref_costs = list(set(ref_costs))
-
-    merged = pareto_costs + ref_costs
-    normalized = normalize_costs(merged)
+    pareto_array = unique_costs(pareto_costs)
+    ref_array = unique_costs(ref_costs)
 
-    offset = len(pareto_costs)
-    pareto_costs = normalized[:offset]
-    ref_costs = normalized[offset:]
+    offset = pareto_array.shape[0]
+    normalized = normalize_costs(np.vstack((pareto_array, ref_array)))
 
-    indicator = IGD(np.array(ref_costs))
-    result = indicator(np.array(pareto_costs))
+    indicator = IGD(normalized[offset:])
+    result = indicator(normalized[:offset])
     if result is None:
         message = f"Cannot calculate IGD in inverted_generational_distance({pareto_costs!r}, ref_costs={ref_costs!r})"
         raise ValueError(message)
@@ -185,10 +173,10 @@ def plot_multi_fronts(
 
     markers = itertools.cycle(["s", "d", "x", "*", "2"])
     for index, (pareto_front, description) in enumerate(pareto_fronts):
-        result_costs = set((round(r[0], 4), round(r[1], 4)) for r in pareto_front)
+        result_costs = np.unique(np.round(np.array(list(pareto_front), dtype=np.float64).reshape(-1, 2), 4), axis=0)
         ax.scatter(
-            [cost[0] for cost in result_costs],
-            [cost[1] for cost in result_costs],
+            result_costs[:, 0],
+            result_costs[:, 1],
             c=f"C{index}",
             marker=next(markers),
             label=description,
@@ -237,12 +225,34 @@ def coverage_indicator(first: Sequence[_CostT], second: Sequence[_CostT]) -> Tup
 
 
 def build_pareto_front(costs: Iterable[_CostT]) -> Set[_CostT]:
+    costs = list(costs)
+    if len(costs) > 0 and len(costs[0]) == 2:
+        return _build_pareto_front_2d(costs)
+
     result: Set[_CostT] = set()
     for cost in costs:
-        if any(cost_dominate(cost, c) for c in result):
+        if any(cost_dominate(c, cost) for c in result):
             continue
 
-        result = {c for c in result if not cost_dominate(c, cost)}
+        result = {c for c in result if not cost_dominate(cost, c)}
         result.add(cost)
 
     return result
+
+
+def _build_pareto_front_2d(costs: Sequence[_CostT]) -> Set[_CostT]:
+    # Same dominance as cost_dominate: coordinates within 0.0001 are ties, and a cost is dominated iff another
+    # one is not worse (within tolerance) in both objectives and strictly better in at least one. Sorting by
+    # the first objective turns both cases into prefix-minimum lookups of the second objective.
+    array = np.array(costs, dtype=np.float64)
+    order = np.argsort(array[:, 0], kind="stable")
+    x = array[order, 0]
+    prefix_min_y = np.concatenate(([np.inf], np.minimum.accumulate(array[order, 1])))
+
+    # Strictly better first objective, second objective not worse
+    dominated = prefix_min_y[np.searchsorted(x, array[:, 0] - 0.0001, side="right")] < array[:, 1] + 0.0001
+
+    # First objective not worse, strictly better second objective
+    dominated |= prefix_min_y[np.searchsorted(x, array[:, 0] + 0.0001, side="left")] <= array[:, 1] - 0.0001
+
+    return set(costs[index] for index in np.flatnonzero(~dominated).tolist())
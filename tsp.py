@@ -14,6 +14,7 @@ class Namespace(argparse.Namespace):
         iterations: int
         shuffle_after: int
         tabu_size: int
+        nearest_neighbors: Optional[int]
         optimal: bool
         verbose: bool
         dump: Optional[str]
@@ -26,6 +27,7 @@ if __name__ == "__main__":
     parser.add_argument("-i", "--iterations", default=500, type=int, help="the number of iterations to run the tabu search for (default: 500)")
     parser.add_argument("-s", "--shuffle-after", default=50, type=int, help="after the specified number of non-improved iterations, shuffle the solution (default: 50)")
     parser.add_argument("-t", "--tabu-size", default=10, type=int, help="the tabu size for every neighborhood (default: 10)")
+    parser.add_argument("-n", "--nearest-neighbors", type=int, help="only evaluate swaps and shifts towards this many nearest cities (default: evaluate all moves)")
     parser.add_argument("-o", "--optimal", action="store_true", help="read the optimal solution from the problem archive")
     parser.add_argument("-v", "--verbose", action="store_true", help="whether to display the progress bar and plot the solution")
     parser.add_argument("-d", "--dump", type=str, help="dump the solution to a file")
@@ -48,6 +50,8 @@ if __name__ == "__main__":
         tsp.Swap.reset_tabu(maxlen=namespace.tabu_size)
         tsp.SegmentShift.reset_tabu(maxlen=namespace.tabu_size)
         tsp.SegmentReverse.reset_tabu(maxlen=namespace.tabu_size)
+        tsp.Swap.nearest_neighbors = namespace.nearest_neighbors
+        tsp.SegmentShift.nearest_neighbors = namespace.nearest_neighbors
 
         solution = tsp.TSPPathSolution.tabu_search(
             pool_size=namespace.pool_size,
@@ -57,7 +61,7 @@ if __name__ == "__main__":
         )
 
         check = tsp.TSPPathSolution(after=solution.after, before=solution.before)
-        assert check.cost() == solution.cost()
+        assert utils.isclose(check.cost(), solution.cost())
 
     print(f"Solution cost = {solution.cost()}\nSolution path: {solution.path}")
 